@@ -1,15 +1,40 @@
+from collections import defaultdict
 import concurrent.futures
 import json
 import multiprocessing
 import os
 from pathlib import Path
+import shutil
+import subprocess
+import sys
 import tempfile
 import threading
-import time
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 import unittest
+from unittest.mock import patch
+import warnings
 
 from waterfalls import Timer
+from waterfalls.timer import Block
+
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Forking a child process is much cheaper than spawning a new interpreter, which is only used where fork isn't available
+FAST_MP_CONTEXT = (
+    multiprocessing.get_context("fork")
+    if "fork" in multiprocessing.get_all_start_methods()
+    else multiprocessing.get_context("spawn")
+)
+
+# Timer names and block texts of the blocks created by `_create_class_blocks`, `_create_context_blocks`
+# and `_create_decorator_blocks`, in the order of creation
+SIMPLE_REPORT_NAMES = ["Timer A"] * 4 + ["Timer B"] * 4
+SIMPLE_REPORT_TEXTS = [None, "Block A", "Block B", None, "Block C", "Block D", "Block E", None]
 
 
 class TestTimer(unittest.TestCase):
@@ -17,6 +42,8 @@ class TestTimer(unittest.TestCase):
     Tests the `waterfalls.Timer` module.
     """
 
+    _tmp_root: str
+
     def test_class_instances(self) -> None:
         """
         Tests timers defined as class instances where each `Timer` instance has multiple blocks.
@@ -102,26 +129,24 @@ class TestTimer(unittest.TestCase):
         # Assert total number of blocks
         self.assertEqual(len(report), 8 * 3)
 
+        by_name, by_text = self._index_report(report)
+
         # Assert timer names
-        self.assertEqual(len([b for b in report if b["name"] == "Timer A"]), 4 * 3)
-        self.assertEqual(len([b for b in report if b["name"] == "Timer B"]), 4 * 3)
+        self.assertEqual(len(by_name["Timer A"]), 4 * 3)
+        self.assertEqual(len(by_name["Timer B"]), 4 * 3)
 
         # Assert block texts
-        self.assertEqual(len([b for b in report if b["text"] == "Block A"]), 3)
-        self.assertEqual(len([b for b in report if b["text"] == "Block B"]), 3)
-        self.assertEqual(len([b for b in report if b["text"] == "Block C"]), 3)
-        self.assertEqual(len([b for b in report if b["text"] == "Block D"]), 3)
-        self.assertEqual(len([b for b in report if b["text"] == "Block E"]), 3)
-
-        # Assert thread durations
-        for i in range(8 * 3 - 1):
-            with self.subTest(i=i):
-                self.assertGreaterEqual(report[i]["thread_duration"], 0)
-
-        # Assert thread IDs
-        for i in range(8 * 3 - 1):
+        self.assertEqual(len(by_text["Block A"]), 3)
+        self.assertEqual(len(by_text["Block B"]), 3)
+        self.assertEqual(len(by_text["Block C"]), 3)
+        self.assertEqual(len(by_text["Block D"]), 3)
+        self.assertEqual(len(by_text["Block E"]), 3)
+
+        # Assert thread durations and thread IDs
+        for i, (block, next_block) in enumerate(zip(report, report[1:])):
             with self.subTest(i=i):
-                self.assertEqual(report[i]["thread_id"], report[i + 1]["thread_id"])
+                self.assertGreaterEqual(block["thread_duration"], 0)
+                self.assertEqual(block["thread_id"], next_block["thread_id"])
 
     def test_nested_report(self) -> None:
         """
@@ -143,25 +168,23 @@ class TestTimer(unittest.TestCase):
         # Assert total number of blocks
         self.assertEqual(len(report), 6)
 
+        by_name, by_text = self._index_report(report)
+
         # Assert timer names
-        self.assertEqual(len([b for b in report if b["name"] == "Decorator timer"]), 2)
-        self.assertEqual(len([b for b in report if b["name"] == "Context timer"]), 2)
-        self.assertEqual(len([b for b in report if b["name"] == "Class timer"]), 2)
+        self.assertEqual(len(by_name["Decorator timer"]), 2)
+        self.assertEqual(len(by_name["Context timer"]), 2)
+        self.assertEqual(len(by_name["Class timer"]), 2)
 
         # Assert block texts
-        self.assertEqual(len([b for b in report if b["text"] == "0"]), 1)
-        self.assertEqual(len([b for b in report if b["text"] == "1"]), 1)
-        self.assertEqual(len([b for b in report if b["text"] is None]), 4)
+        self.assertEqual(len(by_text["0"]), 1)
+        self.assertEqual(len(by_text["1"]), 1)
+        self.assertEqual(len(by_text[None]), 4)
 
-        # Assert thread durations
-        for i in range(6 - 1):
-            with self.subTest(i=i):
-                self.assertGreaterEqual(report[i]["thread_duration"], 0)
-
-        # Assert thread IDs
-        for i in range(6 - 1):
+        # Assert thread durations and thread IDs
+        for i, (block, next_block) in enumerate(zip(report, report[1:])):
             with self.subTest(i=i):
-                self.assertEqual(report[i]["thread_id"], report[i + 1]["thread_id"])
+                self.assertGreaterEqual(block["thread_duration"], 0)
+                self.assertEqual(block["thread_id"], next_block["thread_id"])
 
     def test_block_text(self) -> None:
         """
@@ -259,6 +282,30 @@ class TestTimer(unittest.TestCase):
         report_files = self._save_report_files()
         self.assertEqual(len(report_files), 1)
 
+    def test_save_report_removes_stale_reports(self) -> None:
+        """
+        Tests that saving a report of the main process removes its reports saved by an earlier version
+        or in another format, so they aren't merged into the diagram of the new report.
+        """
+        with Timer("Timer A"):
+            pass
+
+        with tempfile.TemporaryDirectory() as temp_dir_name:
+            for stale_file_name in ["waterfalls.json", "waterfalls.msgpack", "waterfalls.1.ndjson"]:
+                Path(temp_dir_name, stale_file_name).write_bytes(b"")
+            Timer.save_report(directory=temp_dir_name)
+
+            # Reports of child processes don't belong to an earlier run of the main process, they are kept
+            report_files = self._get_files_from_dir(temp_dir_name)
+            self.assertEqual(sorted(report_files), ["waterfalls.1.ndjson", "waterfalls.ndjson"])
+
+            if msgpack is not None:
+                Timer.report_format = "msgpack"
+                Timer.save_report(directory=temp_dir_name)
+
+                report_files = self._get_files_from_dir(temp_dir_name)
+                self.assertEqual(sorted(report_files), ["waterfalls.1.ndjson", "waterfalls.msgpack"])
+
     def test_save_empty_report(self) -> None:
         """
         Tests an attempt to save a report without ever creating any `Timer` instance.
@@ -271,19 +318,15 @@ class TestTimer(unittest.TestCase):
         Tests two `Timer` instances, each created in its own thread.
         """
 
+        barrier = threading.Barrier(2)
+
         def my_function(i):
             with Timer("Timer A", text=i):
-                pass
-
-        threads = []
+                barrier.wait(timeout=5)  # Make sure the pool runs each call in a different thread
 
-        for i in range(2):
-            t = threading.Thread(target=my_function, args=(i,))
-            threads.append(t)
-            t.start()
-
-        for t in threads:
-            t.join()
+        # The pool is shut down right away, its threads must not be running when other tests fork the process
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(my_function, range(2)))
 
         report = Timer.generate_report()
         self._assert_multithread_report(report)
@@ -297,13 +340,11 @@ class TestTimer(unittest.TestCase):
         In this case, there should be three report files - two generated by child processes
         and one generated by the main process.
         """
-        with tempfile.TemporaryDirectory() as temp_dir_name:
-            os.environ["WATERFALLS_DIRECTORY"] = temp_dir_name
-
+        with tempfile.TemporaryDirectory() as temp_dir_name, patch.dict(os.environ, WATERFALLS_DIRECTORY=temp_dir_name):
             processes = []
 
             for i in range(2):
-                p = multiprocessing.Process(target=self._dummy_timed_method, args=(i,))
+                p = FAST_MP_CONTEXT.Process(target=self._dummy_timed_method, args=(i,))
                 processes.append(p)
                 p.start()
 
@@ -319,23 +360,149 @@ class TestTimer(unittest.TestCase):
             self.assertEqual(len(report_files), 3)
 
             for report_file in report_files:
-                with open(os.path.join(temp_dir_name, report_file)) as rf:
-                    report = json.load(rf)
-                    self.assertEqual(len(report), 1)
+                report = self._load_report_file(os.path.join(temp_dir_name, report_file))
+                self.assertEqual(len(report), 1)
+
+    def test_multiprocessing_multiple_blocks(self) -> None:
+        """
+        Tests a `Timer` instance with multiple blocks created in a child process.
+        The child process report must be a valid report containing all blocks after each block is stopped.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir_name, patch.dict(os.environ, WATERFALLS_DIRECTORY=temp_dir_name):
+            # The thread of this process is looked up before forking, the child process must look up its own
+            parent_thread_id = Timer("Timer B").thread_id
+
+            p = FAST_MP_CONTEXT.Process(target=self._dummy_timed_method, args=(0, 3))
+            p.start()
+            p.join()
+
+            report_files = self._get_files_from_dir(temp_dir_name)
+            self.assertEqual(len(report_files), 1)
+
+            report = self._load_report_file(os.path.join(temp_dir_name, report_files[0]))
+            self.assertEqual(len(report), 3)
+            self.assertEqual([block["text"] for block in report], ["0", "0", "0"])
+            self.assertNotEqual(report[0]["thread_id"], parent_thread_id)
+
+    def test_multiprocessing_context_manager(self) -> None:
+        """
+        Tests `Timer` instances used as context managers and decorators in a child process.
+        Blocks stopped when leaving the context must be written into the child process report as well.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir_name, patch.dict(os.environ, WATERFALLS_DIRECTORY=temp_dir_name):
+            p = FAST_MP_CONTEXT.Process(target=self._dummy_context_timed_method, args=(1,))
+            p.start()
+            p.join()
+
+            report_files = self._get_files_from_dir(temp_dir_name)
+            self.assertEqual(len(report_files), 1)
+
+            report = self._load_report_file(os.path.join(temp_dir_name, report_files[0]))
+            self.assertEqual([block["name"] for block in report], ["Timer B", "Timer A"])
+            self.assertEqual([block["text"] for block in report], [None, "1"])
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "requires the fork start method")
+    def test_multiprocessing_nested_fork(self) -> None:
+        """
+        Tests a child process that creates a block and then forks its own child process.
+        Each of them must save its block into its own report file.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir_name, patch.dict(os.environ, WATERFALLS_DIRECTORY=temp_dir_name):
+            p = multiprocessing.get_context("fork").Process(target=self._dummy_forking_timed_method)
+            p.start()
+            p.join()
+
+            report_files = self._get_files_from_dir(temp_dir_name)
+            self.assertEqual(len(report_files), 2)
+
+            for report_file in report_files:
+                report = self._load_report_file(os.path.join(temp_dir_name, report_file))
+                self.assertEqual(len(report), 1)
+
+    def test_multiprocessing_spawn(self) -> None:
+        """
+        Tests a `Timer` instance created in a spawned child process, which runs `atexit` handlers when it exits.
+        The child process must only save its own report file.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir_name, patch.dict(os.environ, WATERFALLS_DIRECTORY=temp_dir_name):
+            p = multiprocessing.get_context("spawn").Process(target=self._dummy_timed_method)
+            p.start()
+            p.join()
+
+            report_files = self._get_files_from_dir(temp_dir_name)
+            self.assertEqual(len(report_files), 1)
+            self.assertRegex(report_files[0], r"waterfalls\.[0-9]+\.ndjson")
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "requires the fork start method")
+    def test_multiprocessing_fork_instances(self) -> None:
+        """
+        Tests that a forked child process doesn't inherit `Timer` instances of its parent.
+        """
+        self._dummy_timed_method(0)
+
+        fork_context = multiprocessing.get_context("fork")
+        queue = fork_context.SimpleQueue()
+        p = fork_context.Process(target=self._dummy_put_instance_count, args=(queue,))
+        p.start()
+        p.join()
+
+        self.assertEqual(queue.get(), 0)
+        self.assertEqual(len(Timer.instances), 1)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires os.fork()")
+    def test_os_fork(self) -> None:
+        """
+        Tests a `Timer` instance created in a child process forked by `os.fork()`, which keeps the process name
+        of its parent. The child process must still write its blocks into its own report file.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir_name, patch.dict(os.environ, WATERFALLS_DIRECTORY=temp_dir_name):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    self._dummy_timed_method(0, 2)
+                finally:
+                    os._exit(0)
+            os.waitpid(pid, 0)
 
-        del os.environ["WATERFALLS_DIRECTORY"]
+            report_files = self._get_files_from_dir(temp_dir_name)
+            self.assertEqual(report_files, [f"waterfalls.{pid}.ndjson"])
+
+            report = self._load_report_file(os.path.join(temp_dir_name, report_files[0]))
+            self.assertEqual([block["text"] for block in report], ["0", "0"])
+
+    def test_reset_after_fork(self) -> None:
+        """
+        Tests that the report file of a child process inherited by a forked process is closed when it is reset.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir_name, patch("waterfalls.timer.unregister"):
+            report_file = open(os.path.join(temp_dir_name, "waterfalls.1.ndjson"), "wb")
+            raw_report_file = report_file.raw
+            Timer._child_report_file = report_file
+            del report_file
+
+            # The file must not be left to its finalizer, which warns about files that haven't been closed
+            with warnings.catch_warnings(record=True) as caught_warnings:
+                warnings.simplefilter("always")
+                Timer._reset_after_fork()
+
+            self.assertIsNone(Timer._child_report_file)
+            self.assertTrue(raw_report_file.closed)
+            self.assertEqual(caught_warnings, [])
 
     def test_concurrent_threading(self) -> None:
         """
         Tests two `Timer` instances, each created in its own thread within a thread pool.
         """
 
+        barrier = threading.Barrier(2)
+
         def my_function(run):
             with Timer("Timer A", text=run):
-                time.sleep(0.5)  # Put the worker to sleep so another thread is started
+                barrier.wait(timeout=5)  # Keep both workers inside their blocks at the same time
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-            {executor.submit(my_function, run): run for run in range(2)}
+        # The pool is shut down right away, its threads must not be running when other tests fork the process
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(my_function, range(2)))
 
         report = Timer.generate_report()
 
@@ -352,19 +519,127 @@ class TestTimer(unittest.TestCase):
         directory = Timer._get_report_directory_path()
         self.assertEqual(directory, Path(os.getcwd()))
 
-        # Directory defined as env variable has a higher priority
-        os.environ["WATERFALLS_DIRECTORY"] = "./environ_directory"
-        directory = Timer._get_report_directory_path()
-        self.assertEqual(directory, Path("./environ_directory"))
+        with patch.dict(os.environ, WATERFALLS_DIRECTORY="./environ_directory"):
+            # Directory defined as env variable has a higher priority
+            directory = Timer._get_report_directory_path()
+            self.assertEqual(directory, Path("./environ_directory"))
 
-        # Directory defined as class variable has a higher priority
-        Timer.directory = "./cls_var_directory"
-        directory = Timer._get_report_directory_path()
-        self.assertEqual(directory, Path("./cls_var_directory"))
+            # Directory defined as class variable has a higher priority
+            Timer.directory = "./cls_var_directory"
+            directory = Timer._get_report_directory_path()
+            self.assertEqual(directory, Path("./cls_var_directory"))
+
+            # Directory defined as function argument has the highest priority
+            directory = Timer._get_report_directory_path("./arg_directory")
+            self.assertEqual(directory, Path("./arg_directory"))
+
+    def test_report_chunks(self) -> None:
+        """
+        Tests that a report written in multiple chunks contains all blocks in order.
+        """
+        self._dummy_timed_method(blocks=5)
+        for i in range(3):
+            with Timer("Timer B", text=str(i)):
+                pass
+
+        with tempfile.TemporaryDirectory() as temp_dir_name, patch("waterfalls.timer.REPORT_CHUNK_SIZE", 2):
+            Timer.save_report(directory=temp_dir_name)
+            report = self._load_report_file(os.path.join(temp_dir_name, "waterfalls.ndjson"))
+
+        self.assertEqual(len(report), 8)
+        self.assertEqual(report, Timer.generate_report())
+
+    def test_stop_while_generating_report(self) -> None:
+        """
+        Tests that a block can be stopped while the report of its timer is being generated.
+        """
+        timer = Timer("Timer A")
+        timer.start(text="0")
+        timer.stop()
+        timer.start(text="1")
+
+        report_blocks = Timer._iter_report()
+        self.assertEqual(next(report_blocks)["text"], "0")
+        timer.stop()
 
-        # Directory defined as function argument has the highest priority
-        directory = Timer._get_report_directory_path("./arg_directory")
-        self.assertEqual(directory, Path("./arg_directory"))
+        self.assertEqual([block.text for block in timer.blocks], ["0", "1"])
+
+    def test_replace_blocks(self) -> None:
+        """
+        Tests that timing blocks of a timer can be replaced, and that changing the returned list of blocks
+        doesn't change the blocks of the timer.
+        """
+        timer_a, timer_b = self._create_class_blocks()
+
+        blocks = timer_a.blocks
+        blocks.clear()
+        self.assertEqual(len(timer_a.blocks), 4)
+
+        timer_a.blocks.pop()
+        del timer_a.blocks[0]
+        timer_a.start(text="Block F")
+        timer_a.stop()
+        blocks = timer_a.blocks
+        self.assertEqual([block.text for block in blocks], [None, "Block A", "Block B", None, "Block F"])
+        self.assertEqual(blocks, [Block(*times, text) for times, text in timer_a._iter_block_fields()])
+
+        timer_a.blocks = blocks[1:3]
+        timer_b.blocks = []
+        report = Timer.generate_report()
+        self.assertEqual([block["text"] for block in report], ["Block A", "Block B"])
+        self.assertEqual(report[0]["start_time"], blocks[1].start_time)
+        self.assertEqual(timer_a.blocks, blocks[1:3])
+
+    def test_report_format(self) -> None:
+        """
+        Tests that report format is properly determined based on priorities,
+        and that it falls back to NDJSON when MessagePack can't be used.
+        """
+        # The format defaults to NDJSON
+        self.assertEqual(Timer._get_report_format(), "ndjson")
+
+        with patch("waterfalls.timer.packb", object()):
+            with patch.dict(os.environ, WATERFALLS_REPORT_FORMAT="msgpack"):
+                # Format defined as env variable
+                self.assertEqual(Timer._get_report_format(), "msgpack")
+
+                # Format defined as class variable has a higher priority
+                Timer.report_format = "ndjson"
+                self.assertEqual(Timer._get_report_format(), "ndjson")
+
+        Timer.report_format = "msgpack"
+        with patch("waterfalls.timer.packb", None), self.assertLogs("waterfalls.timer", "WARNING"):
+            # MessagePack is requested but the package is not installed
+            self.assertEqual(Timer._get_report_format(), "ndjson")
+
+        Timer.report_format = "xml"
+        with self.assertLogs("waterfalls.timer", "WARNING"):
+            self.assertEqual(Timer._get_report_format(), "ndjson")
+
+    @unittest.skipIf(msgpack is None, "requires the msgpack package")
+    def test_msgpack_report(self) -> None:
+        """
+        Tests saving a report in the MessagePack format, from the main process and from a child process.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir_name, patch.dict(
+            os.environ, WATERFALLS_DIRECTORY=temp_dir_name, WATERFALLS_REPORT_FORMAT="msgpack"
+        ):
+            p = FAST_MP_CONTEXT.Process(target=self._dummy_timed_method, args=(1, 2))
+            p.start()
+            p.join()
+
+            self._dummy_timed_method(0)
+            Timer.save_report()
+
+            report_files = self._get_files_from_dir(temp_dir_name)
+            self.assertEqual(len(report_files), 2)
+            self.assertIn("waterfalls.msgpack", report_files)
+
+            for report_file in report_files:
+                with open(os.path.join(temp_dir_name, report_file), "rb") as rf:
+                    report = list(msgpack.Unpacker(rf, raw=False))
+                expected_texts = ["0"] if report_file == "waterfalls.msgpack" else ["1", "1"]
+                self.assertEqual([block["text"] for block in report], expected_texts)
 
     def test_report_file_name(self) -> None:
         """
@@ -373,14 +648,12 @@ class TestTimer(unittest.TestCase):
         When called from a child process, it should contain PID.
         """
         file_name_is_main = Timer._get_report_file_name(is_main_process=True)
-        self.assertEqual(file_name_is_main, "waterfalls.json")
+        self.assertEqual(file_name_is_main, "waterfalls.ndjson")
 
         file_name_not_main = Timer._get_report_file_name(is_main_process=False)
-        self.assertRegex(file_name_not_main, "waterfalls.[0-9]+.json")
-
-        with tempfile.TemporaryDirectory() as temp_dir_name:
-            os.environ["WATERFALLS_DIRECTORY"] = temp_dir_name
+        self.assertRegex(file_name_not_main, r"waterfalls\.[0-9]+\.ndjson")
 
+        with tempfile.TemporaryDirectory() as temp_dir_name, patch.dict(os.environ, WATERFALLS_DIRECTORY=temp_dir_name):
             p = multiprocessing.Process(target=self._dummy_timed_method)
             p.start()
             p.join()
@@ -391,10 +664,10 @@ class TestTimer(unittest.TestCase):
 
             report_files = self._get_files_from_dir(temp_dir_name)
             self.assertEqual(len(report_files), 2)
-            self.assertIn("waterfalls.json", report_files)
+            self.assertIn("waterfalls.ndjson", report_files)
 
-            report_files.remove("waterfalls.json")
-            self.assertRegex(report_files[0], "waterfalls.[0-9]+.json")
+            report_files.remove("waterfalls.ndjson")
+            self.assertRegex(report_files[0], r"waterfalls\.[0-9]+\.ndjson")
 
     def test_repr(self):
         """
@@ -418,12 +691,43 @@ class TestTimer(unittest.TestCase):
         with Timer("Timer D", text="Block D") as timer_d:
             self.assertEqual(repr(timer_d), "Timer (name='Timer D', text='Block D')")
 
+    def test_import_without_viewer(self) -> None:
+        """
+        Tests that importing `Timer` doesn't import the viewer and Matplotlib into the timed program.
+        """
+        code = (
+            "import sys; from waterfalls import Timer; "
+            "print('waterfalls.viewer' in sys.modules, 'matplotlib' in sys.modules)"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "False False")
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Creates a temporary directory for saved reports, so it is removed only once.
+        Also encodes one dummy report block the way `Timer` does, so the first test saving a report doesn't pay
+        for the warm-up of the JSON encoder.
+        """
+        cls._tmp_root = tempfile.mkdtemp()
+        Timer._encode_report_blocks(
+            [dict(name="", text=None, start_time=0, stop_time=0, thread_duration=0, thread_id=0)], "ndjson"
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Removes the temporary directory for saved reports.
+        """
+        shutil.rmtree(cls._tmp_root, ignore_errors=True)
+
     def tearDown(self) -> None:
         """
         Resets `Timer` instances after each test.
         """
         Timer.instances = []
         Timer.directory = None
+        Timer.report_format = None
 
     def _create_class_blocks(self) -> Tuple[Timer, Timer]:
         """
@@ -492,46 +796,40 @@ class TestTimer(unittest.TestCase):
         Creates multiple `Timer` instances, each defined as a function decorator.
         """
 
-        @Timer("Timer A")
-        def my_function_a():
-            pass
-
-        @Timer("Timer A", text="Block A")
-        def my_function_b():
+        def my_function():
             pass
 
-        @Timer("Timer A", text="Block B")
-        def my_function_c():
-            pass
+        specs = [
+            ("Timer A", None),
+            ("Timer A", "Block A"),
+            ("Timer A", "Block B"),
+            ("Timer A", None),
+            ("Timer B", "Block C"),
+            ("Timer B", "Block D"),
+            ("Timer B", "Block E"),
+            ("Timer B", None),
+        ]
 
-        @Timer("Timer A")
-        def my_function_d():
-            pass
-
-        @Timer("Timer B", text="Block C")
-        def my_function_e():
-            pass
+        for name, text in specs:
+            Timer(name, text=text)(my_function)()
 
-        @Timer("Timer B", text="Block D")
-        def my_function_f():
-            pass
-
-        @Timer("Timer B", text="Block E")
-        def my_function_g():
-            pass
+    @staticmethod
+    def _index_report(report: List[dict]) -> Tuple[Dict[str, List[dict]], Dict[Optional[str], List[dict]]]:
+        """
+        Indexes report blocks by timer name and by block text in a single pass.
 
-        @Timer("Timer B")
-        def my_function_h():
-            pass
+        Args:
+            report: List of all timing blocks.
 
-        my_function_a()
-        my_function_b()
-        my_function_c()
-        my_function_d()
-        my_function_e()
-        my_function_f()
-        my_function_g()
-        my_function_h()
+        Returns:
+            Dictionary mapping timer names to their blocks and dictionary mapping block texts to their blocks.
+        """
+        by_name: Dict[str, List[dict]] = defaultdict(list)
+        by_text: Dict[Optional[str], List[dict]] = defaultdict(list)
+        for block in report:
+            by_name[block["name"]].append(block)
+            by_text[block["text"]].append(block)
+        return by_name, by_text
 
     def _assert_simple_report(self, report: List[dict]) -> None:
         """
@@ -545,39 +843,17 @@ class TestTimer(unittest.TestCase):
         self.assertEqual(len(report), 8)
 
         # Assert timer names
-        self.assertEqual(report[0]["name"], "Timer A")
-        self.assertEqual(report[1]["name"], "Timer A")
-        self.assertEqual(report[2]["name"], "Timer A")
-        self.assertEqual(report[3]["name"], "Timer A")
-        self.assertEqual(report[4]["name"], "Timer B")
-        self.assertEqual(report[5]["name"], "Timer B")
-        self.assertEqual(report[6]["name"], "Timer B")
-        self.assertEqual(report[7]["name"], "Timer B")
+        self.assertEqual([block["name"] for block in report], SIMPLE_REPORT_NAMES)
 
         # Assert block texts
-        self.assertIsNone(report[0]["text"])
-        self.assertEqual(report[1]["text"], "Block A")
-        self.assertEqual(report[2]["text"], "Block B")
-        self.assertIsNone(report[3]["text"])
-        self.assertEqual(report[4]["text"], "Block C")
-        self.assertEqual(report[5]["text"], "Block D")
-        self.assertEqual(report[6]["text"], "Block E")
-        self.assertIsNone(report[7]["text"])
+        self.assertEqual([block["text"] for block in report], SIMPLE_REPORT_TEXTS)
 
-        # Assert start and stop times
-        for i in range(7):
-            with self.subTest(i=i):
-                self.assertLessEqual(report[i]["start_time"], report[i]["stop_time"])
-
-        # Assert thread durations
-        for i in range(7):
-            with self.subTest(i=i):
-                self.assertGreaterEqual(report[i]["thread_duration"], 0)
-
-        # Assert thread IDs
-        for i in range(7):
+        # Assert start and stop times, thread durations and thread IDs
+        for i, (block, next_block) in enumerate(zip(report, report[1:])):
             with self.subTest(i=i):
-                self.assertEqual(report[i]["thread_id"], report[i + 1]["thread_id"])
+                self.assertLessEqual(block["start_time"], block["stop_time"])
+                self.assertGreaterEqual(block["thread_duration"], 0)
+                self.assertEqual(block["thread_id"], next_block["thread_id"])
 
     def _assert_multithread_report(self, report: List[dict]) -> None:
         """
@@ -590,11 +866,10 @@ class TestTimer(unittest.TestCase):
         self.assertEqual(len(report), 2)
 
         # Assert timer names
-        self.assertEqual(report[0]["name"], "Timer A")
-        self.assertEqual(report[1]["name"], "Timer A")
+        self.assertEqual([block["name"] for block in report], ["Timer A", "Timer A"])
 
-        self.assertEqual(report[0]["text"], "0")
-        self.assertEqual(report[1]["text"], "1")
+        # Assert block texts
+        self.assertEqual([block["text"] for block in report], ["0", "1"])
 
         # Assert start and stop times
         self.assertLessEqual(report[0]["start_time"], report[0]["stop_time"])
@@ -611,7 +886,7 @@ class TestTimer(unittest.TestCase):
 
         # Assert generated report files
         self.assertEqual(len(report_files), 1)
-        self.assertEqual(report_files[0], "waterfalls.json")
+        self.assertEqual(report_files[0], "waterfalls.ndjson")
 
     def _assert_1_to_1_instances(self) -> None:
         """
@@ -622,37 +897,20 @@ class TestTimer(unittest.TestCase):
         self.assertEqual(len(Timer.instances), 8)
 
         # Assert timer names
-        self.assertEqual(Timer.instances[0].name, "Timer A")
-        self.assertEqual(Timer.instances[1].name, "Timer A")
-        self.assertEqual(Timer.instances[2].name, "Timer A")
-        self.assertEqual(Timer.instances[3].name, "Timer A")
-        self.assertEqual(Timer.instances[4].name, "Timer B")
-        self.assertEqual(Timer.instances[5].name, "Timer B")
-        self.assertEqual(Timer.instances[6].name, "Timer B")
-        self.assertEqual(Timer.instances[7].name, "Timer B")
+        self.assertEqual([instance.name for instance in Timer.instances], SIMPLE_REPORT_NAMES)
 
         # Assert total number of blocks
-        for i in range(7):
-            with self.subTest(i=i):
-                self.assertEqual(len(Timer.instances[i].blocks), 1)
+        self.assertEqual([len(instance.blocks) for instance in Timer.instances], [1] * 8)
 
         # Assert block texts
-        self.assertIsNone(Timer.instances[0].blocks[0].text)
-        self.assertEqual(Timer.instances[1].blocks[0].text, "Block A")
-        self.assertEqual(Timer.instances[2].blocks[0].text, "Block B")
-        self.assertIsNone(Timer.instances[3].blocks[0].text)
-        self.assertEqual(Timer.instances[4].blocks[0].text, "Block C")
-        self.assertEqual(Timer.instances[5].blocks[0].text, "Block D")
-        self.assertEqual(Timer.instances[6].blocks[0].text, "Block E")
-        self.assertIsNone(Timer.instances[7].blocks[0].text)
+        self.assertEqual([instance.blocks[0].text for instance in Timer.instances], SIMPLE_REPORT_TEXTS)
 
         # Assert thread durations
         for i in range(7):
-            with self.subTest(i=i):
-                self.assertGreaterEqual(Timer.instances[i].blocks[0].thread_duration, 0)
+            self.assertGreaterEqual(Timer.instances[i].blocks[0].thread_duration, 0, msg=f"i={i}")
 
     @staticmethod
-    def _dummy_timed_method(i: int = 0) -> None:
+    def _dummy_timed_method(i: int = 0, blocks: int = 1) -> None:
         """
         This method is used for tests using multiprocessing, especially on Windows where `spawn` start method is used.
         A `Process` needs to pickle everything it sends to the worker process.
@@ -661,9 +919,63 @@ class TestTimer(unittest.TestCase):
 
         Args:
             i: Optional process sequential ID that will be set as `text` on the `Timer`.
+            blocks: Number of blocks to create.
         """
-        with Timer("Timer A", text=str(i)):
-            pass
+        timer = Timer("Timer A")
+        for _ in range(blocks):
+            timer.start(text=str(i))
+            timer.stop()
+
+    @staticmethod
+    def _dummy_context_timed_method(i: int = 0) -> None:
+        """
+        Creates a block of a `Timer` used as context manager, nested in a block of a `Timer` used as decorator.
+
+        Args:
+            i: Optional process sequential ID that will be set as `text` of the decorator block.
+        """
+
+        @Timer("Timer A", text=str(i))
+        def my_function():
+            with Timer("Timer B"):
+                pass
+
+        my_function()
+
+    @classmethod
+    def _dummy_forking_timed_method(cls) -> None:
+        """
+        Creates a block and then runs `_dummy_timed_method` in a forked child process.
+        """
+        cls._dummy_timed_method(0)
+
+        p = multiprocessing.get_context("fork").Process(target=cls._dummy_timed_method, args=(1,))
+        p.start()
+        p.join()
+
+    @staticmethod
+    def _dummy_put_instance_count(queue: multiprocessing.SimpleQueue) -> None:
+        """
+        Puts the number of `Timer` instances of the current process into the queue.
+
+        Args:
+            queue: Queue for sending the number to the parent process.
+        """
+        queue.put(len(Timer.instances))
+
+    @staticmethod
+    def _load_report_file(report_file_path: str) -> List[dict]:
+        """
+        Loads a report file, which contains one JSON timing block per line.
+
+        Args:
+            report_file_path: Path of the report file.
+
+        Returns:
+            List of all timing blocks.
+        """
+        with open(report_file_path, "rb") as report_file:
+            return [json.loads(line) for line in report_file]
 
     def _save_report_files(self) -> List[str]:
         """
@@ -672,9 +984,9 @@ class TestTimer(unittest.TestCase):
         Returns:
             List of names of saved report files.
         """
-        with tempfile.TemporaryDirectory() as temp_dir_name:
-            Timer.save_report(directory=temp_dir_name)
-            return self._get_files_from_dir(temp_dir_name)
+        temp_dir_name = tempfile.mkdtemp(dir=self._tmp_root)
+        Timer.save_report(directory=temp_dir_name)
+        return self._get_files_from_dir(temp_dir_name)
 
     @staticmethod
     def _get_files_from_dir(directory: str) -> List[str]:
@@ -687,7 +999,8 @@ class TestTimer(unittest.TestCase):
         Returns:
             List of all files in the specified `directory` or an empty list if the `directory` has no files.
         """
-        return [f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
+        with os.scandir(directory) as entries:
+            return [entry.name for entry in entries if entry.is_file()]
 
 
 if __name__ == "__main__":
@@ -1,5 +1,8 @@
+import io
 import json
 import os
+import subprocess
+import sys
 import tempfile
 import unittest
 from unittest.mock import patch
@@ -7,6 +10,12 @@ from unittest.mock import patch
 from waterfalls import Viewer, viewer
 
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
 class TestViewer(unittest.TestCase):
     """
     Tests the `waterfalls.Viewer` module.
@@ -14,7 +23,7 @@ class TestViewer(unittest.TestCase):
 
     def test_detect_overlap(self) -> None:
         """
-        Tests detecting overlap of timing blocks.
+        Tests detecting overlap of timing blocks, which must be sorted by their start time.
         """
         # Blocks do not overlap
         blocks = [{"start_time": 25, "stop_time": 31}, {"start_time": 35, "stop_time": 42}]
@@ -28,9 +37,17 @@ class TestViewer(unittest.TestCase):
         blocks = [{"start_time": 25, "stop_time": 31}, {"start_time": 30, "stop_time": 42}]
         self.assertTrue(Viewer._detect_overlap(blocks))
 
+        # Blocks of a timer are sorted before detecting overlap, blocks out of order don't overlap
+        blocks = [
+            {"name": "Timer A", "start_time": 35, "stop_time": 42, "thread_id": 101},
+            {"name": "Timer A", "start_time": 25, "stop_time": 31, "thread_id": 100},
+        ]
+        self.assertEqual(list(Viewer()._format_timer_names({"Timer A": blocks})), ["Timer A"])
+
     def test_load_blocks_from_reports(self) -> None:
         """
         Tests loading timing blocks from report files.
+        The report saved as a single JSON array by older versions of Waterfalls must be loaded as well.
         """
         report_a = [
             {"name": "Timer A", "text": "Block A", "start_time": 25, "stop_time": 35, "thread_id": 100},
@@ -42,8 +59,8 @@ class TestViewer(unittest.TestCase):
         ]
 
         with tempfile.TemporaryDirectory() as temp_dir_name:
-            with open(os.path.join(temp_dir_name, "waterfalls.json"), "w") as f:
-                json.dump(report_a, f)
+            with open(os.path.join(temp_dir_name, "waterfalls.ndjson"), "w") as f:
+                f.writelines(json.dumps(block) + "\n" for block in report_a)
             with open(os.path.join(temp_dir_name, "waterfalls.1.json"), "w") as f:
                 json.dump(report_b, f)
 
@@ -85,6 +102,45 @@ class TestViewer(unittest.TestCase):
             ]
             self.assertCountEqual(blocks, expected_blocks)
 
+    def test_load_blocks_with_non_ascii_text(self) -> None:
+        """
+        Tests loading timing blocks with non-ASCII texts, which are written into the report as UTF-8 by orjson
+        and as escape sequences by the standard library `json` module. Both must be loaded by either of them.
+        """
+        block = {"name": "Časovač A", "text": "Blok 🐍", "start_time": 25, "stop_time": 35, "thread_id": 100}
+        utf8_line = json.dumps(block, ensure_ascii=False).encode() + b"\n"
+        escaped_line = json.dumps(block).encode() + b"\n"
+
+        for json_loads in (json.loads, viewer.loads):
+            with self.subTest(loads=json_loads.__module__), patch("waterfalls.viewer.loads", json_loads):
+                report_files = [
+                    ("waterfalls.ndjson", io.BytesIO(utf8_line + escaped_line)),
+                    ("waterfalls.1.json", io.BytesIO(json.dumps([block], ensure_ascii=False).encode())),
+                ]
+                blocks = Viewer._load_blocks_from_report_files(report_files)
+                self.assertEqual(blocks, [block] * 3)
+
+    @unittest.skipIf(msgpack is None, "requires the msgpack package")
+    def test_load_blocks_from_msgpack_reports(self) -> None:
+        """
+        Tests loading timing blocks from a report file saved in the MessagePack format.
+        """
+        report = [
+            {"name": "Timer A", "text": "Block A", "start_time": 25, "stop_time": 35, "thread_id": 100},
+            {"name": "Timer B", "text": None, "start_time": 45, "stop_time": 55, "thread_id": 101},
+        ]
+
+        with tempfile.TemporaryDirectory() as temp_dir_name:
+            with open(os.path.join(temp_dir_name, "waterfalls.msgpack"), "wb") as f:
+                f.writelines(msgpack.packb(block) for block in report)
+
+            viewer_instance = Viewer(directory=temp_dir_name)
+            blocks = viewer_instance._load_blocks_from_reports(viewer_instance._get_report_file_paths())
+            self.assertEqual(blocks, report)
+
+            with patch("waterfalls.viewer.Unpacker", None), self.assertRaises(SystemExit):
+                viewer_instance._load_blocks_from_reports(viewer_instance._get_report_file_paths())
+
     def test_group_blocks_to_timers(self) -> None:
         """
         Tests grouping of timing blocks into named timers.
@@ -321,15 +377,12 @@ class TestViewer(unittest.TestCase):
             {"name": "Timer A", "text": "Block D", "start_time": 33, "stop_time": 43, "thread_id": 101},
         ]
 
-        with tempfile.TemporaryDirectory() as temp_dir_name:
-            with open(os.path.join(temp_dir_name, "waterfalls.json"), "w") as f:
-                json.dump(report_a, f)
-            with open(os.path.join(temp_dir_name, "waterfalls.1.json"), "w") as f:
-                json.dump(report_b, f)
-
-            viewer_instance = Viewer(directory=temp_dir_name)
-            report_file_paths = viewer_instance._get_report_file_paths()
-            blocks = viewer_instance._load_blocks_from_reports(report_file_paths)
+        viewer_instance = Viewer()
+        report_files = [
+            ("waterfalls.ndjson", io.BytesIO("".join(json.dumps(block) + "\n" for block in report_a).encode())),
+            ("waterfalls.1.json", io.BytesIO(json.dumps(report_b).encode())),
+        ]
+        blocks = viewer_instance._load_blocks_from_report_files(report_files)
 
         timers, time_total, time_min = viewer_instance._group_blocks_to_timers(blocks)
         timers = viewer_instance._format_timer_names(timers)
@@ -419,6 +472,18 @@ class TestViewer(unittest.TestCase):
         time_unit = viewer_instance._determine_time_unit(time_total=1000000000 * 3600 * 1234)
         self.assertEqual(time_unit.name, "milliseconds")
 
+    def test_default_directory(self) -> None:
+        """
+        Tests that the default directory is the current working directory at the time `Viewer` is constructed.
+        """
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as temp_dir_name:
+            try:
+                os.chdir(temp_dir_name)
+                self.assertEqual(Viewer().directory, os.getcwd())
+            finally:
+                os.chdir(cwd)
+
     def test_non_existent_directory(self) -> None:
         """
         Tests that trying to load report files from a non existent directory raises `SystemExit` exception.
@@ -427,21 +492,32 @@ class TestViewer(unittest.TestCase):
         with self.assertRaises(SystemExit):
             viewer_instance._get_report_file_paths()
 
-    def test_empty_report_files(self) -> None:
+    def test_special_characters_in_directory(self) -> None:
         """
-        Tests that when there is not even one timing block in any of the loaded report files,
-        the `SystemExit` exception is raised.
+        Tests that report files are found in a directory whose name contains glob pattern characters.
         """
         with tempfile.TemporaryDirectory() as temp_dir_name:
-            with open(os.path.join(temp_dir_name, "waterfalls.json"), "w") as file:
-                json.dump([], file)
-            with open(os.path.join(temp_dir_name, "waterfalls.1.json"), "w") as file:
+            directory = os.path.join(temp_dir_name, "[reports]*")
+            os.mkdir(directory)
+            with open(os.path.join(directory, "waterfalls.json"), "w") as file:
                 json.dump([], file)
+            os.mkdir(os.path.join(directory, "waterfalls.1.json"))
 
-            viewer_instance = Viewer(directory=temp_dir_name)
+            viewer_instance = Viewer(directory=directory)
             report_file_paths = viewer_instance._get_report_file_paths()
-            with self.assertRaises(SystemExit):
-                viewer_instance._load_blocks_from_reports(report_file_paths)
+            self.assertEqual(report_file_paths, [os.path.join(directory, "waterfalls.json")])
+
+    def test_empty_report_files(self) -> None:
+        """
+        Tests that when there is not even one timing block in any of the loaded report files,
+        the `SystemExit` exception is raised.
+        """
+        report_files = [
+            ("waterfalls.ndjson", io.BytesIO(b"")),
+            ("waterfalls.1.json", io.BytesIO(b"[]")),
+        ]
+        with self.assertRaises(SystemExit):
+            Viewer._load_blocks_from_report_files(report_files)
 
     def test_save_as_image(self) -> None:
         """
@@ -468,6 +544,77 @@ class TestViewer(unittest.TestCase):
 
             self.assertIn("waterfalls.svg", files)
 
+    def test_zero_duration_block(self) -> None:
+        """
+        Tests that a block with zero duration (shorter than the clock resolution) can be rendered.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir_name:
+            report = [
+                {
+                    "name": "Timer A",
+                    "text": None,
+                    "start_time": 10,
+                    "stop_time": 10,
+                    "thread_duration": 0,
+                    "thread_id": 100,
+                },
+                {
+                    "name": "Timer A",
+                    "text": None,
+                    "start_time": 20,
+                    "stop_time": 30,
+                    "thread_duration": 5,
+                    "thread_id": 100,
+                },
+            ]
+
+            with open(os.path.join(temp_dir_name, "waterfalls.json"), "w") as file:
+                json.dump(report, file)
+
+            Viewer(directory=temp_dir_name, save_image=True).visualize_report()
+
+            self.assertTrue(os.path.isfile(os.path.join(temp_dir_name, "waterfalls.svg")))
+
+    def test_import_without_matplotlib(self) -> None:
+        """
+        Tests that Matplotlib is not imported until a diagram is rendered.
+        """
+        code = "import sys; from waterfalls import viewer; print('matplotlib' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "False")
+
+    def test_public_names(self) -> None:
+        """
+        Tests that `Viewer` is listed by `dir()` and imported by `import *` even though it is imported lazily.
+        """
+        code = (
+            "import waterfalls; print('Viewer' in dir(waterfalls)); "
+            "from waterfalls import *; print(Viewer.__name__, Timer.__name__)"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.split(), ["True", "Viewer", "Timer"])
+
+    def test_load_blocks_without_orjson(self) -> None:
+        """
+        Tests that reports are saved and loaded with the standard library `json` when orjson is not installed.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir_name:
+            code = (
+                "import sys; sys.modules['orjson'] = None; "
+                "from waterfalls import Timer, Viewer; "
+                "Timer('Timer A').start(); Timer.instances[0].stop(); "
+                f"Timer.save_report(directory={temp_dir_name!r}); "
+                f"viewer = Viewer(directory={temp_dir_name!r}); "
+                "blocks = viewer._load_blocks_from_reports(viewer._get_report_file_paths()); "
+                "Timer.instances = []; "
+                "print(blocks[0]['name'])"
+            )
+            result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+            self.assertEqual(result.stdout.strip(), "Timer A")
+
+            with open(os.path.join(temp_dir_name, "waterfalls.ndjson")) as report_file:
+                self.assertEqual(json.loads(report_file.readline())["name"], "Timer A")
+
     def test_argument_parser(self):
         """
         Tests that command line arguments are parsed properly.
@@ -1,5 +1,27 @@
+from typing import TYPE_CHECKING, Any, List
+
 from .timer import Timer
-from .viewer import Viewer
+
+
+if TYPE_CHECKING:
+    from .viewer import Viewer
 
 
 __version__ = "0.2.1"
+
+__all__ = ["Timer", "Viewer"]
+
+
+def __getattr__(name: str) -> Any:
+    # The viewer pulls in Matplotlib, so it is only imported when it is used,
+    # not when a timed program imports `Timer`
+    if name == "Viewer":
+        from .viewer import Viewer
+
+        return Viewer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    # `Viewer` is listed before it is imported by `__getattr__`
+    return sorted(set(globals()) | set(__all__))
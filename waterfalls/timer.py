@@ -26,17 +26,37 @@ As a decorator:
 
 from __future__ import annotations
 
-from atexit import register
+from atexit import register, unregister
 from collections import namedtuple
 from contextlib import ContextDecorator
-from json import dump
-from logging import getLogger
+from io import BufferedWriter
+from itertools import islice
+from logging import INFO, getLogger
 from multiprocessing import current_process
 from os import environ, getcwd, getpid
 from pathlib import Path
-from threading import get_native_id
+from struct import Struct
+import sys
+from threading import Lock, get_native_id, local
 from time import perf_counter_ns, thread_time_ns
-from typing import List, Optional
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+try:
+    from orjson import dumps
+except ImportError:
+    # orjson is an optional faster encoder, the standard library one writes the same report
+    from json import dumps as json_dumps
+
+    def dumps(obj: Any) -> bytes:  # type: ignore[misc]
+        return json_dumps(obj).encode()
+
+
+try:
+    from msgpack import packb
+except ImportError:
+    # msgpack is optional, it is only needed for reports saved in the MessagePack format
+    packb = None
 
 
 logger = getLogger(__name__)
@@ -44,6 +64,15 @@ logger = getLogger(__name__)
 
 Block = namedtuple("Block", ["start_time", "stop_time", "thread_duration", "text"])
 
+# Start time, stop time and thread duration of a block, packed as one record of the block buffer of a timer
+BLOCK_TIMES = Struct("<qqq")
+
+# Number of blocks encoded and written at once when saving a report
+REPORT_CHUNK_SIZE = 4096
+
+# Formats a report can be saved in, which are also the extensions of the report files
+REPORT_FORMATS = ("ndjson", "msgpack")
+
 
 class Timer(ContextDecorator):
     """
@@ -55,6 +84,13 @@ class Timer(ContextDecorator):
 
     instances: List[Timer] = []
     directory: Optional[str] = None
+    report_format: Optional[str] = None
+
+    _child_report_file: Optional[BufferedWriter] = None
+    _child_report_format: str = "ndjson"
+    _child_report_lock: Lock = Lock()
+    _main_process_id: int = getpid()
+    _thread_cache: local = local()
 
     def __init__(self, name: str, text: Optional[str] = None) -> None:
         """
@@ -66,11 +102,21 @@ class Timer(ContextDecorator):
         """
         self.name: str = name
         self.text: Optional[str] = str(text) if text is not None else None
-        self.blocks: List[Block] = []
-        self.thread_id: int = get_native_id()
+        # Times of all blocks are packed into one buffer, no objects are allocated for the times of a block
+        self._block_times = bytearray()
+        self._texts: List[Optional[str]] = []
+        # Blocks assembled by the `blocks` property so far
+        self._blocks: List[Block] = []
+        thread_cache = self._thread_cache
+        if not hasattr(thread_cache, "thread_id"):
+            # Neither the thread ID nor the process change during the life of a thread, look them up only once
+            thread_cache.thread_id = get_native_id()
+            # A process forked by `os.fork()` keeps the name of its parent, it is told apart by its process ID
+            thread_cache.is_main_process = current_process().name == "MainProcess" and getpid() == self._main_process_id
+        self.thread_id: int = thread_cache.thread_id
         self._start_time: Optional[int] = None
         self._start_thread_time: int = 0
-        self._is_main_process: bool = current_process().name == "MainProcess"
+        self._is_main_process: bool = thread_cache.is_main_process
 
         self.__class__.instances.append(self)
 
@@ -98,6 +144,10 @@ class Timer(ContextDecorator):
         Args:
             text: Text of the timing block.
         """
+        # Read the clocks before any bookkeeping so it isn't included in the block
+        stop_time = perf_counter_ns()
+        stop_thread_time = thread_time_ns()
+
         if self._start_time is None:
             logger.warning("Timer hasn't been started yet. Use .start() to start it first.")
             return
@@ -105,21 +155,48 @@ class Timer(ContextDecorator):
         if text is not None:
             self.text = str(text)
 
-        self.blocks.append(
-            Block(
-                start_time=self._start_time,
-                stop_time=perf_counter_ns(),
-                thread_duration=thread_time_ns() - self._start_thread_time,
-                text=self.text,
-            )
-        )
+        self._block_times += BLOCK_TIMES.pack(self._start_time, stop_time, stop_thread_time - self._start_thread_time)
+        self._texts.append(self.text)
         self._start_time = None
         self.text = None
 
         if not self._is_main_process:
-            # Python doesn't honor `atexit` registrations in forked processes (https://bugs.python.org/issue39675).
-            # When running in a child process, generate the report immediately
-            self.save_report(is_main_process=False)
+            # Python doesn't honor `atexit` registrations in forked processes (https://bugs.python.org/issue39675),
+            # so the report of a child process can't wait until the program exits
+            self._append_to_child_report(self._block_to_dict(len(self._texts) - 1))
+
+    @property
+    def blocks(self) -> List[Block]:
+        """
+        Timing blocks of the timer.
+
+        The blocks are assembled from the stored block times and texts when they are accessed, each block only once.
+        Every access returns a new list, changes of the list are not stored. Assign a new list of blocks
+        (e.g., `timer.blocks = []`) to replace them.
+        """
+        blocks = self._blocks
+        texts = self._texts
+        for index in range(len(blocks), len(texts)):
+            start_time, stop_time, thread_duration = BLOCK_TIMES.unpack_from(
+                self._block_times, index * BLOCK_TIMES.size
+            )
+            blocks.append(Block(start_time, stop_time, thread_duration, texts[index]))
+        # The assembled blocks are kept in sync with the stored ones, a change of the returned list must not affect them
+        return list(blocks)
+
+    @blocks.setter
+    def blocks(self, blocks: List[Block]) -> None:
+        """
+        Replaces timing blocks of the timer.
+
+        Args:
+            blocks: New timing blocks of the timer.
+        """
+        self._block_times = bytearray().join(
+            BLOCK_TIMES.pack(block.start_time, block.stop_time, block.thread_duration) for block in blocks
+        )
+        self._texts = [block.text for block in blocks]
+        self._blocks = []
 
     @classmethod
     def generate_report(cls) -> List[dict]:
@@ -129,22 +206,7 @@ class Timer(ContextDecorator):
         Returns:
             List of dictionaries, each dictionary representing one timing block.
         """
-        report = []
-
-        for instance in cls.instances:
-            for block in instance.blocks:
-                report.append(
-                    dict(
-                        name=instance.name,
-                        text=block.text,
-                        start_time=block.start_time,
-                        stop_time=block.stop_time,
-                        thread_duration=block.thread_duration,
-                        thread_id=instance.thread_id,
-                    )
-                )
-
-        return report
+        return list(cls._iter_report())
 
     @classmethod
     def save_report(cls, directory: Optional[str] = None, is_main_process: bool = True) -> None:
@@ -160,20 +222,94 @@ class Timer(ContextDecorator):
             # This method runs even when `waterfalls` is only imported and no `Timer` instance is created
             return
 
-        report = cls.generate_report()
-        if not report:
+        if not any(instance._texts for instance in cls.instances):
             logger.warning("No Timer block has been created, report will not be saved.")
             return
 
+        report_format = cls._get_report_format()
         report_directory_path = cls._get_report_directory_path(directory)
-        report_file_name = cls._get_report_file_name(is_main_process)
+        report_file_name = cls._get_report_file_name(is_main_process, report_format)
         report_directory_path.mkdir(parents=True, exist_ok=True)
         report_file_path = report_directory_path.joinpath(report_file_name)
+        if is_main_process:
+            cls._remove_stale_main_reports(report_directory_path, report_file_name)
+
+        with open(report_file_path, "wb") as report_file:
+            # Blocks are encoded and written in chunks, so the report is never held in memory as a whole,
+            # and a whole chunk is concatenated at once instead of every block separately
+            report_blocks = cls._iter_report()
+            while True:
+                report_chunk = list(islice(report_blocks, REPORT_CHUNK_SIZE))
+                if not report_chunk:
+                    break
+                report_file.write(cls._encode_report_blocks(report_chunk, report_format))
+
+        if logger.isEnabledFor(INFO):
+            # Resolving the path walks the file system, skip it when the message would be discarded anyway
+            logger.info("Waterfalls report saved into file '%s'", report_file_path.resolve())
+
+    @classmethod
+    def _append_to_child_report(cls, report_block: dict) -> None:
+        """
+        Appends one timing block to the report of the current child process.
+
+        The report file is opened once per process and kept open, so stopping a block doesn't rewrite
+        the whole report. Each block is written as one record and flushed,
+        so the file is a valid report after every call, even if the process is terminated.
+
+        Args:
+            report_block: Dictionary representing the timing block.
+        """
+        with cls._child_report_lock:
+            if cls._child_report_file is None:
+                cls._child_report_format = cls._get_report_format()
+                report_directory_path = cls._get_report_directory_path()
+                report_directory_path.mkdir(parents=True, exist_ok=True)
+                report_file_path = report_directory_path.joinpath(
+                    cls._get_report_file_name(is_main_process=False, report_format=cls._child_report_format)
+                )
+                cls._child_report_file = open(report_file_path, "wb")
+                if logger.isEnabledFor(INFO):
+                    logger.info("Waterfalls report saved into file '%s'", report_file_path.resolve())
+
+            cls._child_report_file.write(cls._encode_report_blocks([report_block], cls._child_report_format))
+            cls._child_report_file.flush()
+
+    def _block_to_dict(self, index: int) -> dict:
+        """
+        Converts a timing block of this timer into its report representation.
 
-        with open(report_file_path, "w") as report_file:
-            dump(report, report_file)
+        Args:
+            index: Index of the timing block of this timer.
+
+        Returns:
+            Dictionary representing the timing block.
+        """
+        start_time, stop_time, thread_duration = BLOCK_TIMES.unpack_from(self._block_times, index * BLOCK_TIMES.size)
+        return dict(
+            name=self.name,
+            text=self._texts[index],
+            start_time=start_time,
+            stop_time=stop_time,
+            thread_duration=thread_duration,
+            thread_id=self.thread_id,
+        )
+
+    @staticmethod
+    def _encode_report_blocks(report_blocks: List[dict], report_format: str) -> bytes:
+        """
+        Encodes timing blocks as records of the report file.
+
+        Args:
+            report_blocks: Dictionaries representing the timing blocks.
+            report_format: Format of the report, as returned by `_get_report_format`.
 
-        logger.info("Waterfalls report saved into file '%s'", report_file_path.resolve())
+        Returns:
+            One MessagePack map, or one line of JSON terminated by a newline, for each timing block.
+        """
+        if report_format == "msgpack":
+            return b"".join(map(packb, report_blocks))
+        return b"\n".join(map(dumps, report_blocks)) + b"\n"
 
     @classmethod
     def _get_report_directory_path(cls, directory: Optional[str] = None) -> Path:
@@ -187,12 +323,13 @@ class Timer(ContextDecorator):
             return Path(directory)
         if cls.directory is not None:
             return Path(cls.directory)
-        if environ.get("WATERFALLS_DIRECTORY") is not None:
-            return Path(environ["WATERFALLS_DIRECTORY"])
+        environ_directory = environ.get("WATERFALLS_DIRECTORY")
+        if environ_directory is not None:
+            return Path(environ_directory)
         return Path(getcwd())
 
     @staticmethod
-    def _get_report_file_name(is_main_process: bool) -> str:
+    def _get_report_file_name(is_main_process: bool, report_format: str = "ndjson") -> str:
         """
         Determines the report file name.
         When `Timer` is running in a forked (child) process, the file name contains the process ID
@@ -201,13 +338,113 @@ class Timer(ContextDecorator):
         Args:
             is_main_process: Should be `True` if function is called from main process,
                 `False` if called from a child process.
+            report_format: Format of the report, which is used as the file extension.
 
         Returns:
             File name of the report.
         """
         if is_main_process:
-            return "waterfalls.json"
-        return f"waterfalls.{getpid()}.json"
+            return f"waterfalls.{report_format}"
+        return f"waterfalls.{getpid()}.{report_format}"
+
+    @classmethod
+    def _get_report_format(cls) -> str:
+        """
+        Determines the format of the report.
+
+        Returns:
+            `msgpack` when MessagePack is chosen by `Timer.report_format` or by the `WATERFALLS_REPORT_FORMAT`
+            environment variable, and the `msgpack` package is installed. `ndjson` otherwise.
+        """
+        report_format = cls.report_format if cls.report_format is not None else environ.get("WATERFALLS_REPORT_FORMAT")
+        if report_format == "msgpack":
+            if packb is not None:
+                return report_format
+            logger.warning("Package msgpack is not installed, report will be saved as NDJSON.")
+        elif report_format not in (None, "ndjson"):
+            logger.warning("Unknown report format '%s', report will be saved as NDJSON.", report_format)
+        return "ndjson"
+
+    def _iter_block_fields(self) -> Iterator[Tuple[Tuple[int, int, int], Optional[str]]]:
+        """
+        Iterates over the stored block times and texts block by block.
+
+        Yields:
+            Times (start time, stop time and thread duration) and text of each timing block.
+        """
+        block_times = self._block_times
+        texts = self._texts
+        block_count = len(texts)
+        # The buffer is copied one chunk at a time, never as a whole. Iterating over the buffer itself would lock
+        # its size, and a block stopped meanwhile couldn't be stored. Such a block is not included, as the count of
+        # the blocks is taken up front
+        for first_index in range(0, block_count, REPORT_CHUNK_SIZE):
+            last_index = min(first_index + REPORT_CHUNK_SIZE, block_count)
+            times_chunk = block_times[first_index * BLOCK_TIMES.size : last_index * BLOCK_TIMES.size]
+            yield from zip(BLOCK_TIMES.iter_unpack(times_chunk), texts[first_index:last_index])
+
+    @classmethod
+    def _iter_report(cls) -> Iterator[dict]:
+        """
+        Generates report of the current process block by block.
+
+        Yields:
+            Dictionary representing one timing block.
+        """
+        for instance in cls.instances:
+            # Fields shared by all blocks of the instance are looked up once, not for every block
+            name = instance.name
+            thread_id = instance.thread_id
+            for (start_time, stop_time, thread_duration), text in instance._iter_block_fields():
+                yield {
+                    "name": name,
+                    "text": text,
+                    "start_time": start_time,
+                    "stop_time": stop_time,
+                    "thread_duration": thread_duration,
+                    "thread_id": thread_id,
+                }
+
+    @staticmethod
+    def _remove_stale_main_reports(report_directory_path: Path, report_file_name: str) -> None:
+        """
+        Removes reports of the main process saved under another file name by an earlier run.
+        The viewer loads all reports in the directory, a stale report would be merged into the diagram.
+
+        Args:
+            report_directory_path: Directory into which the report will be saved.
+            report_file_name: File name of the report that will be saved.
+        """
+        # Reports of the main process were saved as a JSON array before NDJSON was introduced,
+        # and a report saved in the other format by an earlier run is as stale as the legacy one
+        stale_file_names = ["waterfalls.json"]
+        stale_file_names += [Timer._get_report_file_name(True, report_format) for report_format in REPORT_FORMATS]
+        for stale_file_name in stale_file_names:
+            if stale_file_name == report_file_name:
+                continue
+            try:
+                report_directory_path.joinpath(stale_file_name).unlink()
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def _reset_after_fork(cls) -> None:
+        """
+        Resets the state inherited from the parent process when the current process has been forked.
+        A forked child must not append its blocks into the report of its parent, it must not inherit
+        a lock that may have been held by another thread of the parent, and it must look up its own thread ID.
+        Timers of the parent are not inherited either, their blocks are saved in the report of the parent,
+        and the child must not overwrite that report with its own when it exits.
+        """
+        unregister(Timer.save_report)
+        cls.instances = []
+        if cls._child_report_file is not None:
+            # The inherited file is closed right away, not by its finalizer at some point later. Its buffer is empty,
+            # each block is flushed as soon as it is written, so only its raw file is left to be closed
+            cls._child_report_file.detach().close()
+            cls._child_report_file = None
+        cls._child_report_lock = Lock()
+        cls._thread_cache = local()
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__} (name={self.name!r}, text={self.text!r})"
@@ -220,4 +457,13 @@ class Timer(ContextDecorator):
         self.stop()
 
 
-register(Timer.save_report)
+if current_process().name == "MainProcess":
+    # Child processes write each block into their report when it is stopped. A spawned child runs `atexit` handlers
+    # when it exits (unlike a forked one), and it must not save its blocks once more as the report of the main process
+    register(Timer.save_report)
+
+if sys.platform != "win32":
+    # Windows can't fork, its child processes always start with a fresh interpreter
+    from os import register_at_fork
+
+    register_at_fork(after_in_child=Timer._reset_after_fork)
@@ -4,15 +4,30 @@ Shows diagrams from reports generated by Waterfalls.
 from __future__ import annotations
 
 import argparse
+from bisect import bisect_right
 from collections import defaultdict, namedtuple
-from glob import glob
-import json
+from itertools import chain
 import logging
+from operator import itemgetter
 import os
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import matplotlib.pyplot as plt
+
+try:
+    from orjson import loads
+except ImportError:
+    # orjson is an optional faster parser, the standard library one reads the same reports
+    from json import loads  # type: ignore[assignment]
+
+try:
+    from msgpack import Unpacker
+except ImportError:
+    # msgpack is optional, it is only needed for reports saved in the MessagePack format
+    Unpacker = None
+
+if TYPE_CHECKING:
+    import matplotlib.pyplot as plt
 
 
 TimeUnit = namedtuple("TimeUnit", ["name", "si_symbol", "user_symbol", "ns_multiple"])
@@ -25,6 +40,8 @@ TIME_UNITS = [
     TimeUnit("minutes", "m", "min", 1e9 * 60),
     TimeUnit("hours", "h", "hour", 1e9 * 3600),
 ]
+# Number of nanoseconds from which each time unit is used, sorted from lowest to highest
+TIME_UNIT_THRESHOLDS = [time_unit.ns_multiple for time_unit in TIME_UNITS]
 COLOR_LIGHT = "#e5ecf6"
 COLOR_DARK = "#20293d"
 COLOR_BLUE = "#64c9ec"
@@ -44,7 +61,7 @@ class Viewer:
 
     def __init__(
         self,
-        directory: str = os.getcwd(),
+        directory: Optional[str] = None,
         user_time_unit: Optional[str] = None,
         show_thread_id: bool = False,
         show_horizontal_lines: bool = False,
@@ -55,6 +72,7 @@ class Viewer:
 
         Args:
             directory: Directory containing report file(s) generated by `waterfalls.Timer`.
+                When `None`, then the current working directory at the time of construction is used.
             user_time_unit: Time unit defined as `TimeUnit.user_symbol` (e.g., `msec`).
                 When `None`, then the most appropriate time unit is determined automatically.
             show_thread_id: When `True`, each timer will show its thread ID.
@@ -63,7 +81,7 @@ class Viewer:
             save_image: When `True`, then diagram will be saved as `waterfalls.svg` image
                 in the reports `directory`.
         """
-        self.directory = directory
+        self.directory = directory if directory is not None else os.getcwd()
         self.user_time_unit = user_time_unit
         self.show_thread_id = show_thread_id
         self.show_horizontal_lines = show_horizontal_lines
@@ -93,34 +111,48 @@ class Viewer:
             time_unit: Time unit that should be used for the time axis and all durations.
             time_min: Time of the first block of all timers that will be used as the beginning of the time axis.
         """
+        from matplotlib.collections import PolyCollection
+
         timer_names = []
+        block_bars = []
+        thread_bars = []
+        ns_multiple = time_unit.ns_multiple
+        si_symbol = time_unit.si_symbol
 
         # Place blocks on the diagram
         for i, (timer_name, blocks) in enumerate(data.items()):
             timer_names.append(timer_name)
-            block_times = []
-            thread_durations = []
+            bar_bottom = i * 10 + 1
+            bar_middle = bar_bottom + 4
+            bar_top = bar_bottom + 8
 
             for block in blocks:
-                start_time = (block["start_time"] - time_min) / time_unit.ns_multiple
-                duration = (block["stop_time"] - block["start_time"]) / time_unit.ns_multiple
-                cpu_percent = min(block["thread_duration"] / (block["stop_time"] - block["start_time"]) * 100, 100)
-                block_times.append([start_time, duration])
-                thread_durations.append([start_time, block["thread_duration"] / time_unit.ns_multiple])
+                # Keep the nanoseconds as integers and convert them to the time unit only once
+                duration_ns = block["stop_time"] - block["start_time"]
+                start_time = (block["start_time"] - time_min) / ns_multiple
+                duration = duration_ns / ns_multiple
+                thread_duration = block["thread_duration"] / ns_multiple
+                # Blocks shorter than the clock resolution have zero duration
+                cpu_percent = min(block["thread_duration"] * 100 / duration_ns, 100) if duration_ns > 0 else 0
+                block_bars.append(_bar_vertices(start_time, duration, bar_bottom, bar_top))
+                thread_bars.append(_bar_vertices(start_time, thread_duration, bar_bottom, bar_top))
                 ax.text(
                     x=start_time,
-                    y=i * 10 + 5,
-                    s=f"time: {duration:.3f} {time_unit.si_symbol}\ncpu: {cpu_percent:.1f} %",
+                    y=bar_middle,
+                    s=f"time: {duration:.3f} {si_symbol}\ncpu: {cpu_percent:.1f} %",
                     color=COLOR_DARK,
                     verticalalignment="bottom",
                 )
-                ax.text(x=start_time, y=i * 10 + 5, s=block["text"], color=COLOR_DARK, verticalalignment="top")
+                if block["text"] is not None:
+                    # Blocks without text would only add empty text artists to render
+                    ax.text(x=start_time, y=bar_middle, s=block["text"], color=COLOR_DARK, verticalalignment="top")
 
-            # Block duration
-            ax.broken_barh(block_times, (i * 10 + 1, 8), facecolors=COLOR_BLUE, edgecolor=COLOR_BORDER)
+        # Block duration (bars of all timers form one collection, which keeps large reports fast to render)
+        ax.add_collection(PolyCollection(block_bars, facecolors=COLOR_BLUE, edgecolors=COLOR_BORDER))
 
-            # Thread duration
-            ax.broken_barh(thread_durations, (i * 10 + 1, 8), facecolors=COLOR_BORDER)
+        # Thread duration
+        ax.add_collection(PolyCollection(thread_bars, facecolors=COLOR_BORDER))
+        ax.autoscale_view()
 
         # Place timer names on the diagram
         y_tick_placement = [i * 10 + 5 for i in range(len(timer_names))]
@@ -164,11 +196,9 @@ class Viewer:
                 if self.user_time_unit == time_unit.user_symbol:
                     return time_unit
 
-        for time_unit in reversed(TIME_UNITS):
-            if time_total / time_unit.ns_multiple >= 1:
-                return time_unit
-
-        return TIME_UNITS[0]
+        # Index of the largest time unit which is not larger than the total time
+        index = bisect_right(TIME_UNIT_THRESHOLDS, time_total) - 1
+        return TIME_UNITS[max(index, 0)]
 
     def _format_diagram(self, fig: plt.Figure, ax: plt.axes.AxesSubplot, time_unit: TimeUnit, time_total: int) -> None:
         """
@@ -231,11 +261,14 @@ class Viewer:
         formatted_timers = defaultdict(list)
 
         for timer_name, blocks in timers.items():
-            blocks.sort(key=lambda block: block["start_time"])
+            blocks.sort(key=itemgetter("start_time"))
             if self.show_thread_id or self._detect_overlap(blocks):
+                # Group by the integer thread ID and format each timer name only once
+                thread_timers = defaultdict(list)
                 for block in blocks:
-                    timer_and_thread_name = f"{block['name']}\nthread: {block['thread_id']}"
-                    formatted_timers[timer_and_thread_name].append(block)
+                    thread_timers[block["thread_id"]].append(block)
+                for thread_id, thread_blocks in thread_timers.items():
+                    formatted_timers[f"{timer_name}\nthread: {thread_id}"].extend(thread_blocks)
             else:
                 formatted_timers[timer_name] = blocks
 
@@ -251,7 +284,18 @@ class Viewer:
         Raises:
             SystemExit: When no report file is found in the specified directory.
         """
-        report_file_paths = glob(str(self.directory_path.joinpath("waterfalls*.json")))
+        try:
+            with os.scandir(self.directory_path) as entries:
+                report_file_paths = [
+                    entry.path
+                    for entry in entries
+                    if entry.name.startswith("waterfalls")
+                    and entry.name.endswith((".ndjson", ".json", ".msgpack"))
+                    and entry.is_file()
+                ]
+        except (FileNotFoundError, NotADirectoryError):
+            report_file_paths = []
+
         if not report_file_paths:
             raise SystemExit(
                 f"No Waterfalls report file found in directory '{str(self.directory_path.resolve())}'. "
@@ -273,46 +317,88 @@ class Viewer:
             and star time of the first block.
         """
         timers = defaultdict(list)
-        start_times = []
-        stop_times = []
+        time_min = blocks[0]["start_time"]
+        time_max = blocks[0]["stop_time"]
 
+        # Blocks are grouped and the times are compared in one pass, so each block is only visited once
         for block in blocks:
-            block_name = block["name"]
-            timers[block_name].append(block)
-            start_times.append(block["start_time"])
-            stop_times.append(block["stop_time"])
+            timers[block["name"]].append(block)
+            start_time = block["start_time"]
+            stop_time = block["stop_time"]
+            if start_time < time_min:
+                time_min = start_time
+            if stop_time > time_max:
+                time_max = stop_time
 
-        time_min = min(start_times)
-        time_max = max(stop_times)
         time_total = time_max - time_min
 
         return timers, time_total, time_min
 
     @staticmethod
-    def _load_blocks_from_reports(report_file_paths: List[str]) -> BlocksType:
+    def _load_blocks_from_report_files(report_files: Iterable[Tuple[str, BinaryIO]]) -> BlocksType:
         """
-        Loads all timing blocks from all report files.
+        Loads all timing blocks from report files opened in binary mode.
+
+        Reports contain one JSON block per line, or a stream of MessagePack maps when the file extension
+        is `.msgpack`. Reports saved by older versions of Waterfalls, which contain a single JSON array,
+        are loaded as well.
 
         Args:
-            report_file_paths: List of all report file paths in reports directory.
+            report_files: Pairs of the report file path, which determines the format of the report,
+                and the report file itself.
 
         Returns:
             List of timing blocks.
 
         Raises:
-            SystemExit: When no timing block found in any of the reports.
+            SystemExit: When no timing block found in any of the reports,
+                or when a MessagePack report is found and the `msgpack` package is not installed.
         """
         blocks = []
 
-        for report_file_path in report_file_paths:
-            with open(report_file_path) as report_file:
-                blocks.extend(json.load(report_file))
+        for report_file_path, report_file in report_files:
+            if report_file_path.endswith(".msgpack"):
+                if Unpacker is None:
+                    raise SystemExit(f"Package msgpack is required to load report file '{report_file_path}'")
+                blocks.extend(Unpacker(report_file, raw=False))
+                continue
+
+            first_line = report_file.readline()
+            if first_line.startswith(b"["):
+                blocks.extend(loads(first_line + report_file.read()))
+            else:
+                # Parse the report line by line, so only one block is held in memory as raw bytes
+                blocks.extend(loads(line) for line in chain((first_line,), report_file) if line.strip())
 
         if not blocks:
             raise SystemExit("No timing block found in the report file(s)")
 
         return blocks
 
+    @classmethod
+    def _load_blocks_from_reports(cls, report_file_paths: List[str]) -> BlocksType:
+        """
+        Loads all timing blocks from all report files.
+
+        Args:
+            report_file_paths: List of all report file paths in reports directory.
+
+        Returns:
+            List of timing blocks.
+
+        Raises:
+            SystemExit: When no timing block found in any of the reports,
+                or when a MessagePack report is found and the `msgpack` package is not installed.
+        """
+
+        def open_report_files() -> Iterator[Tuple[str, BinaryIO]]:
+            for report_file_path in report_file_paths:
+                # Reports are UTF-8, both JSON parsers decode bytes themselves without depending on the locale
+                with open(report_file_path, "rb") as report_file:
+                    yield report_file_path, report_file
+
+        return cls._load_blocks_from_report_files(open_report_files())
+
     def _render_diagram(self, data: TimersType, time_unit: TimeUnit, time_total: int, time_min: int) -> None:
         """
         Renders Matplotlib diagram.
@@ -323,6 +409,9 @@ class Viewer:
             time_total: Number of nanoseconds between the start time of the first block and stop time of the last block.
             time_min: Time of the first block of all timers that will be used as the beginning of the time axis.
         """
+        # Matplotlib takes a long time to import, so it is only imported when a diagram is actually rendered
+        import matplotlib.pyplot as plt
+
         fig, ax = plt.subplots(figsize=(16, 9))
         self._add_data_to_diagram(ax, data, time_unit, time_min)
         self._format_diagram(fig, ax, time_unit, time_total)
@@ -342,17 +431,37 @@ class Viewer:
         and then by `start_time`.
 
         Args:
-            timers: Dictionary mapping timer names and a list of all their blocks.
+            timers: Dictionary mapping timer names and a list of all their blocks (as returned by
+                `_format_timer_names`). Blocks of each timer must be sorted by `start_time` from lowest to highest
+                and, when thread ID showing is enabled, they must belong to a single thread.
 
         Returns:
             Dictionary mapping sorted timers and a list of all their blocks.
         """
-        timers = dict(sorted(timers.items(), key=lambda item: min(block["start_time"] for block in item[1])))
 
-        if self.show_thread_id:
-            timers = dict(sorted(timers.items(), key=lambda item: min(block["thread_id"] for block in item[1])))
+        def sort_key(item: Tuple[str, BlocksType]) -> Tuple[int, ...]:
+            first_block = item[1][0]
+            if self.show_thread_id:
+                return first_block["thread_id"], first_block["start_time"]
+            return (first_block["start_time"],)
+
+        return dict(sorted(timers.items(), key=sort_key))
+
+
+def _bar_vertices(left: float, width: float, bottom: float, top: float) -> List[Tuple[float, float]]:
+    """
+    Creates vertices of a horizontal bar.
+
+    Args:
+        left: Position of the left edge of the bar.
+        width: Width of the bar.
+        bottom: Position of the bottom edge of the bar.
+        top: Position of the top edge of the bar.
 
-        return timers
+    Returns:
+        List of four vertices of the bar, the same as `Axes.broken_barh` uses.
+    """
+    return [(left, bottom), (left, top), (left + width, top), (left + width, bottom)]
 
 
 def _parse_arguments() -> argparse.Namespace: